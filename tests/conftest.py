@@ -13,3 +13,24 @@ def isolated_mpmath_precision():
     yield
     # Restore the original precision after the test is done.
     mpmath.mp.dps = original_dps
+
+@pytest.fixture(autouse=True)
+def isolated_zero_cache(tmp_path, monkeypatch):
+    """
+    Points the on-disk zeta zero cache at a per-test directory so tests never
+    read or write the user's real cache.
+    """
+    monkeypatch.setenv("ZETANOISE_CACHE_DIR", str(tmp_path / "zetanoise-cache"))
+
+@pytest.fixture(params=["numba", "numpy"])
+def backend(request, monkeypatch):
+    """
+    Runs a test once with the compiled Numba kernels and once with the NumPy
+    fallback. The Numba run is skipped when numba is not installed.
+    """
+    from zetanoise import _kernels
+    use_numba = request.param == "numba"
+    if use_numba and not _kernels.HAVE_NUMBA:
+        pytest.skip("numba not installed")
+    monkeypatch.setattr(_kernels, "HAVE_NUMBA", use_numba)
+    return request.param
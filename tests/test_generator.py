@@ -1,3 +1,5 @@
+import warnings
+
 import numpy as np
 import pytest
 from zetanoise import ZetaNoiseGenerator
@@ -60,3 +62,345 @@ def test_caching():
     
     np.testing.assert_array_equal(gen1.zeros, gen3.zeros[:5])
     assert gen1.zeros.shape != gen3.zeros.shape
+
+def _reference_generate(gen, length, amplitude, seed):
+    """Straightforward NumPy version of generate, used as ground truth."""
+    rng = np.random.default_rng(seed)
+    base_noise = rng.standard_normal(length)
+    zeta_freqs = gen.zeros.copy()
+    if gen.gue_scale > 0:
+        zeta_freqs *= 1 + gen.gue_scale * rng.exponential(1, size=gen.num_zeros)
+    t = np.arange(length)
+    sines = np.sin(2 * np.pi * zeta_freqs[:, np.newaxis] * t / length)
+    return base_noise + amplitude * np.sum(sines, axis=0)
+
+def test_generate_matches_reference(backend):
+    """Test that the compiled and NumPy paths agree with the reference formula."""
+    gen = ZetaNoiseGenerator(num_zeros=10, gue_scale=0.01)
+    noise = gen.generate(length=500, amplitude=0.1, seed=7)
+    expected = _reference_generate(gen, 500, 0.1, 7)
+    np.testing.assert_allclose(noise, expected, rtol=1e-9, atol=1e-9)
+
+def test_generate_does_not_mutate_zeros():
+    """Test that GUE repulsion leaves the stored zeros untouched."""
+    gen = ZetaNoiseGenerator(num_zeros=10, gue_scale=0.01)
+    zeros_before = gen.zeros.copy()
+    noise1 = gen.generate(length=128, seed=123)
+    noise2 = gen.generate(length=128, seed=123)
+
+    np.testing.assert_array_equal(gen.zeros, zeros_before)
+    np.testing.assert_array_equal(noise1, noise2)
+
+@pytest.mark.parametrize("n", [512, 511])
+def test_spectrum_matches_full_fft(n):
+    """Test that the real-input spectrum equals the first half of the full FFT."""
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    noise = gen.generate(length=n, seed=3)
+    freqs, spec = gen.spectrum(noise)
+
+    np.testing.assert_allclose(freqs, np.fft.fftfreq(n)[:n // 2])
+    np.testing.assert_allclose(spec, np.abs(np.fft.fft(noise)[:n // 2])**2)
+
+def test_spectrum_preserves_input():
+    """Test that spectrum leaves the caller's signal untouched."""
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    noise = gen.generate(length=20000, seed=5)
+    original = noise.copy()
+    gen.spectrum(noise)
+    gen.spectrum(list(noise))
+
+    np.testing.assert_array_equal(noise, original)
+
+def test_stats_peak_spacing():
+    """Test that the peak spacing is computed from the strongest bins."""
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    noise = gen.generate(length=2048, seed=11)
+    freqs, spec = gen.spectrum(noise)
+    top = np.sort(freqs[np.argsort(spec)[-20:]])
+    stats = gen.stats(noise, num_peaks=20)
+
+    assert stats['avg_peak_spacing'] == pytest.approx(np.mean(np.diff(top)))
+
+def test_generate_returns_independent_arrays():
+    """Test that a later call does not overwrite an earlier result."""
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    noise1 = gen.generate(length=256, seed=1)
+    snapshot = noise1.copy()
+    gen.generate(length=256, seed=2)
+
+    np.testing.assert_array_equal(noise1, snapshot)
+
+def test_generate_into_out():
+    """Test that generate writes into and returns a caller-supplied buffer."""
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    out = np.empty(256)
+    result = gen.generate(length=256, seed=9, out=out)
+
+    assert result is out
+    np.testing.assert_array_equal(out, gen.generate(length=256, seed=9))
+    with pytest.raises(ValueError):
+        gen.generate(length=128, out=out)
+
+@pytest.mark.parametrize("gue_scale", [0, 0.01])
+def test_generate_batch(gue_scale):
+    """Test batch output shape, reproducibility, and per-row modulation."""
+    gen = ZetaNoiseGenerator(num_zeros=5, gue_scale=gue_scale)
+    batch = gen.generate_batch(4, length=256, amplitude=0.1, seed=21)
+
+    assert batch.shape == (4, 256)
+    np.testing.assert_array_equal(batch, gen.generate_batch(4, length=256, amplitude=0.1, seed=21))
+
+    rng = np.random.default_rng(21)
+    base = rng.standard_normal((4, 256))
+    factors = 1 + gue_scale * rng.exponential(1, size=(4, 5)) if gue_scale else np.ones((4, 5))
+    t = np.arange(256)
+    for row, noise, f in zip(batch, base, factors):
+        sines = np.sin(2 * np.pi * (gen.zeros * f)[:, np.newaxis] * t / 256)
+        np.testing.assert_allclose(row, noise + 0.1 * sines.sum(axis=0), rtol=1e-9, atol=1e-9)
+
+def test_flint_and_mpmath_zeros_agree(monkeypatch):
+    """Test that both zero-finding backends return the same float64 zeros."""
+    from zetanoise import generator
+    if generator._flint_acb is None:
+        pytest.skip("python-flint not installed")
+    flint_zeros = generator._compute_zeta_zeros(12, 30)
+    monkeypatch.setattr(generator, "_flint_acb", None)
+    with warnings.catch_warnings():
+        # The gmpy2 hint belongs to generator construction, not this helper.
+        warnings.simplefilter("error")
+        mpmath_zeros = generator._compute_zeta_zeros(12, 30)
+
+    np.testing.assert_allclose(flint_zeros, mpmath_zeros, rtol=1e-15)
+
+@pytest.mark.filterwarnings("ignore:mpmath is using its pure-Python backend")
+def test_disk_cache(monkeypatch):
+    """Test that computed zeros are persisted and reused as a prefix."""
+    from zetanoise import generator
+    monkeypatch.setattr(generator, "_zeta_zero_cache", {})
+    gen12 = ZetaNoiseGenerator(num_zeros=12, precision=15)
+
+    def fail(N, precision):
+        raise AssertionError("zeros should have come from the disk cache")
+
+    monkeypatch.setattr(generator, "_zeta_zero_cache", {})
+    monkeypatch.setattr(generator, "_compute_zeta_zeros", fail)
+    gen11 = ZetaNoiseGenerator(num_zeros=11, precision=15)
+
+    np.testing.assert_array_equal(gen11.zeros, gen12.zeros[:11])
+
+@pytest.mark.filterwarnings("ignore:mpmath is using its pure-Python backend")
+def test_zeros_computed_at_float64_precision(monkeypatch):
+    """Test that zeros are computed with only the digits float64 can hold."""
+    from zetanoise import generator
+    monkeypatch.setattr(generator, "_zeta_zero_cache", {})
+    calls = []
+    compute = generator._compute_zeta_zeros
+
+    def record(N, precision):
+        calls.append(precision)
+        return compute(N, precision)
+
+    monkeypatch.setattr(generator, "_compute_zeta_zeros", record)
+    gen50 = ZetaNoiseGenerator(num_zeros=11, precision=50)
+    gen30 = ZetaNoiseGenerator(num_zeros=11, precision=30)
+
+    assert calls == [25]
+    np.testing.assert_array_equal(gen50.zeros, gen30.zeros)
+
+def test_warns_without_gmpy_backend(monkeypatch):
+    """Test that the slow pure-Python mpmath backend is reported."""
+    import mpmath
+    from zetanoise import generator
+    monkeypatch.setattr(generator, "_flint_acb", None)
+    monkeypatch.setattr(mpmath.libmp, "BACKEND", "python")
+
+    monkeypatch.setattr(generator, "_zeta_zero_cache", {})
+
+    with pytest.warns(UserWarning, match="gmpy2") as record:
+        ZetaNoiseGenerator(num_zeros=11)
+    # The warning should point at the caller's line, not inside the package.
+    assert record[0].filename == __file__
+
+def test_generate_device():
+    """Test device selection: unknown devices are rejected, CUDA output is well-formed."""
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    with pytest.raises(ValueError):
+        gen.generate(length=64, device='tpu')
+
+    pytest.importorskip("cupy")
+    noise = gen.generate(length=256, seed=4, device='cuda')
+    assert isinstance(noise, np.ndarray)
+    assert noise.shape == (256,)
+    np.testing.assert_array_equal(noise, gen.generate(length=256, seed=4, device='cuda'))
+
+def test_generate_float32(backend):
+    """Test that the float32 path returns float32 close to the float64 result."""
+    gen = ZetaNoiseGenerator(num_zeros=10, gue_scale=0)
+    noise32 = gen.generate(length=512, seed=8, dtype=np.float32)
+    noise64 = gen.generate(length=512, seed=8, amplitude=0.1)
+    rng32 = np.random.default_rng(8).standard_normal(512, dtype=np.float32)
+    rng64 = np.random.default_rng(8).standard_normal(512)
+
+    assert noise32.dtype == np.float32
+    np.testing.assert_allclose(noise32 - rng32, noise64 - rng64, atol=1e-3)
+    assert gen.generate_batch(2, length=64, dtype=np.float32).dtype == np.float32
+    with pytest.raises(ValueError):
+        gen.generate(length=64, dtype=np.int32)
+
+def test_spectrum_pyfftw_matches_scipy(monkeypatch):
+    """Test that the cached pyFFTW plan gives the same spectrum as scipy."""
+    from zetanoise import generator
+    if generator._pyfftw_builders is None:
+        pytest.skip("pyfftw not installed")
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    noise = gen.generate(length=1000, seed=6)
+    _, spec_fftw = gen.spectrum(noise)
+    _, spec_again = gen.spectrum(noise)
+    monkeypatch.setattr(generator, "_pyfftw_builders", None)
+    _, spec_scipy = gen.spectrum(noise)
+
+    assert 1000 in generator._fft_plans.by_length
+    np.testing.assert_allclose(spec_fftw, spec_scipy, rtol=1e-9)
+    np.testing.assert_array_equal(spec_fftw, spec_again)
+
+def test_stats_mean_std(backend):
+    """Test that the single-pass mean/std agrees with NumPy."""
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    noise = 3 + gen.generate(length=10001, seed=13)
+    stats = gen.stats(noise)
+
+    assert stats['mean'] == pytest.approx(np.mean(noise), rel=1e-12)
+    assert stats['std'] == pytest.approx(np.std(noise), rel=1e-12)
+
+def test_effective_freqs_cache():
+    """Test that cached repulsed frequencies reproduce the uncached output."""
+    gen = ZetaNoiseGenerator(num_zeros=10, gue_scale=0.05)
+    first = gen.generate(length=300, seed=31)
+    assert len(gen._effective_freqs_cache) == 1
+    second = gen.generate(length=300, seed=31)
+
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_allclose(first, _reference_generate(gen, 300, 0.1, 31), rtol=1e-9, atol=1e-9)
+
+    gen.gue_scale = 0.1
+    np.testing.assert_allclose(gen.generate(length=300, seed=31),
+                               _reference_generate(gen, 300, 0.1, 31), rtol=1e-9, atol=1e-9)
+
+def test_generate_thread_safe(monkeypatch):
+    """Test that concurrent NumPy-path calls on one instance do not interfere."""
+    from concurrent.futures import ThreadPoolExecutor
+    from zetanoise import _kernels
+    monkeypatch.setattr(_kernels, "HAVE_NUMBA", False)
+
+    gen = ZetaNoiseGenerator(num_zeros=10)
+    seeds = list(range(40))
+    expected = [gen.generate(length=4096, seed=s) for s in seeds]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda s: gen.generate(length=4096, seed=s), seeds))
+
+    for got, want in zip(results, expected):
+        np.testing.assert_array_equal(got, want)
+
+def test_spectrum_thread_safe():
+    """Test that concurrent spectrum calls at one length do not interfere."""
+    from concurrent.futures import ThreadPoolExecutor
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    signals = [gen.generate(length=4096, seed=s) for s in range(40)]
+    expected = [gen.spectrum(x)[1] for x in signals]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda x: gen.spectrum(x)[1], signals))
+
+    for got, want in zip(results, expected):
+        np.testing.assert_array_equal(got, want)
+
+def test_generate_same_seed_thread_safe():
+    """Test that concurrent calls with one seed all reproduce that seed."""
+    from concurrent.futures import ThreadPoolExecutor
+    gen = ZetaNoiseGenerator(num_zeros=5, gue_scale=0)
+    expected = gen.generate(length=10000, seed=17)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: gen.generate(length=10000, seed=17), range(40)))
+
+    for got in results:
+        np.testing.assert_array_equal(got, expected)
+
+@pytest.mark.parametrize("layer", ["default", "workqueue"])
+@pytest.mark.parametrize("warm_up", [True, False])
+def test_parallel_kernels_thread_safe(layer, warm_up):
+    """Test concurrent kernel launches, with and without a main-thread first call."""
+    import os
+    import subprocess
+    import sys
+    import textwrap
+    pytest.importorskip("numba")
+    script = textwrap.dedent(f"""
+        from concurrent.futures import ThreadPoolExecutor
+        from zetanoise import ZetaNoiseGenerator
+        gen = ZetaNoiseGenerator(num_zeros=5)
+        def work(seed):
+            return gen.stats(gen.generate(length=4096, seed=seed))
+        if {warm_up}:
+            work(0)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(work, range(40)))
+    """)
+    env = dict(os.environ)
+    if layer != "default":
+        env["NUMBA_THREADING_LAYER"] = layer
+    result = subprocess.run([sys.executable, "-c", script], env=env,
+                            capture_output=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr.decode()
+
+def test_generate_distinct_seeds_thread_safe():
+    """Test that concurrent misses on the per-seed cache do not collide on eviction."""
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+    # Switch threads as often as possible to expose races between check and delete.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        gen = ZetaNoiseGenerator(num_zeros=5, gue_scale=0.05)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda s: gen.generate(length=16, seed=s), range(20000)))
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert len(results) == 20000
+    assert len(gen._effective_freqs_cache) <= 32
+
+def test_evict_oldest_tolerates_concurrent_eviction():
+    """Test eviction when another thread removes the oldest key first."""
+    from zetanoise import generator
+
+    class RacyDict(dict):
+        def __iter__(self):
+            key = next(super().__iter__())
+            super().__delitem__(key)  # Simulates another thread evicting it.
+            yield key
+
+    cache = RacyDict((i, i) for i in range(generator._MAX_SEED_CACHE))
+    generator._evict_oldest(cache, generator._MAX_SEED_CACHE)
+
+    assert len(cache) < generator._MAX_SEED_CACHE
+
+def test_length_caches_are_bounded(backend):
+    """Test that sweeping lengths does not grow the per-length caches."""
+    from zetanoise import generator
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    for length in range(64, 64 + 4 * generator._MAX_LENGTH_CACHE):
+        gen.generate(length=length, seed=length)
+
+    assert len(gen._scaled_freqs_cache) <= generator._MAX_LENGTH_CACHE
+    assert len(gen._t_cache) <= generator._MAX_LENGTH_CACHE
+
+def test_fft_plan_cache_is_bounded():
+    """Test that spectra at many lengths do not accumulate FFTW plans."""
+    from zetanoise import generator
+    if generator._pyfftw_builders is None:
+        pytest.skip("pyfftw not installed")
+    gen = ZetaNoiseGenerator(num_zeros=5)
+    for n in range(64, 64 + 4 * generator._MAX_LENGTH_CACHE):
+        gen.spectrum(np.ones(n))
+
+    assert len(generator._fft_plans.by_length) <= generator._MAX_LENGTH_CACHE
@@ -0,0 +1,146 @@
+"""
+Compiled inner loops for ZetaNoise.
+
+Numba is an optional dependency. When it is not installed, HAVE_NUMBA is
+False and the generator falls back to its vectorized NumPy path.
+"""
+import math
+import threading
+
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # pragma: no cover - exercised only without numba
+    HAVE_NUMBA = False
+
+# Numba's 'workqueue' threading layer aborts the process if two threads
+# launch parallel kernels at once. The layer is only known after the first
+# launch, so launches are serialized until then, and for good on workqueue.
+_launch_lock = threading.Lock()
+_threading_layer = None
+
+def kernels_available():
+    """
+    Returns True if the compiled kernels may be launched from this thread.
+
+    The threading layer must start on the main thread: TBB initialized from
+    a worker thread can hang the interpreter at exit. Until the main thread
+    has launched a kernel, other threads use the NumPy fallback.
+    """
+    return HAVE_NUMBA and (
+        _threading_layer is not None
+        or threading.current_thread() is threading.main_thread()
+    )
+
+def _launch(kernel, *args):
+    """
+    Calls a parallel kernel, holding a lock when the threading layer needs it.
+    """
+    global _threading_layer
+    if _threading_layer is not None and _threading_layer != 'workqueue':
+        return kernel(*args)
+    with _launch_lock:
+        result = kernel(*args)
+        _threading_layer = numba.threading_layer()
+    return result
+
+def accumulate_sines(cycle_step, amplitude, out):
+    """
+    Thread-safe entry point for _accumulate_sines.
+    """
+    _launch(_accumulate_sines, cycle_step, amplitude, out)
+
+def mean_std(x):
+    """
+    Thread-safe entry point for _mean_std.
+    """
+    return _launch(_mean_std, x)
+
+# Samples per parallel block. Each block re-seeds its oscillators exactly,
+# so recurrence round-off cannot grow beyond this many steps.
+_BLOCK = 256
+
+# Samples per parallel block in the single-pass statistics (fits in L1/L2).
+_STATS_BLOCK = 4096
+
+if HAVE_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _accumulate_sines(cycle_step, amplitude, out):
+        """
+        Adds amplitude * sum_k sin(2*pi*cycle_step[k]*i) to out[i] for each
+        sample i, without materializing the (num_zeros, length) sine matrix.
+        Each sample is read and written once, so out can already hold the noise.
+
+        Each zero is a unit phasor z_k advanced by w_k = exp(2j*pi*cycle_step[k])
+        per sample, so the inner loop is a complex multiply instead of a sin.
+        """
+        length = out.shape[0]
+        num_zeros = cycle_step.shape[0]
+        wr = np.empty(num_zeros)
+        wi = np.empty(num_zeros)
+        for k in range(num_zeros):
+            wr[k] = math.cos(2.0 * math.pi * cycle_step[k])
+            wi[k] = math.sin(2.0 * math.pi * cycle_step[k])
+
+        num_blocks = (length + _BLOCK - 1) // _BLOCK
+        for b in prange(num_blocks):
+            start = b * _BLOCK
+            stop = min(start + _BLOCK, length)
+            zr = np.empty(num_zeros)
+            zi = np.empty(num_zeros)
+            for k in range(num_zeros):
+                # Drop whole cycles first so the seed phase lies in [0, 2*pi).
+                cycles = cycle_step[k] * start
+                phase = 2.0 * math.pi * (cycles - math.floor(cycles))
+                zr[k] = math.cos(phase)
+                zi[k] = math.sin(phase)
+            for i in range(start, stop):
+                acc = 0.0
+                for k in range(num_zeros):
+                    acc += zi[k]
+                    r = zr[k] * wr[k] - zi[k] * wi[k]
+                    zi[k] = zr[k] * wi[k] + zi[k] * wr[k]
+                    zr[k] = r
+                out[i] += amplitude * acc
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _mean_std(x):
+        """
+        Returns (mean, population std) of x in a single pass over memory.
+
+        Each cache-sized block gets an exact two-pass mean and sum of squared
+        deviations while it is resident; the per-block moments are then
+        merged with Chan et al.'s pairwise update, as in Welford's method.
+        """
+        n = x.shape[0]
+        num_blocks = (n + _STATS_BLOCK - 1) // _STATS_BLOCK
+        means = np.zeros(num_blocks)
+        m2s = np.zeros(num_blocks)
+        for b in prange(num_blocks):
+            start = b * _STATS_BLOCK
+            stop = min(start + _STATS_BLOCK, n)
+            total = 0.0
+            for i in range(start, stop):
+                total += x[i]
+            mean = total / (stop - start)
+            m2 = 0.0
+            for i in range(start, stop):
+                delta = x[i] - mean
+                m2 += delta * delta
+            means[b] = mean
+            m2s[b] = m2
+
+        count = 0
+        mean = 0.0
+        m2 = 0.0
+        for b in range(num_blocks):
+            block_count = min(_STATS_BLOCK, n - b * _STATS_BLOCK)
+            total_count = count + block_count
+            delta = means[b] - mean
+            mean += delta * block_count / total_count
+            m2 += m2s[b] + delta * delta * count * block_count / total_count
+            count = total_count
+        return mean, math.sqrt(m2 / n)
@@ -1,6 +1,46 @@
+import glob
+import numbers
+import os
+import re
+import threading
+import warnings
+
 import numpy as np
 import mpmath
-from scipy.fft import fft, fftfreq
+from scipy.fft import rfft, rfftfreq
+
+from . import _kernels
+
+try:
+    # Arb's batch zero finder is much faster than calling mpmath.zetazero per zero.
+    from flint import acb as _flint_acb, ctx as _flint_ctx
+except ImportError:
+    _flint_acb = None
+
+try:
+    # FFTW plans can be built once per length and reused by spectrum().
+    import pyfftw.builders as _pyfftw_builders
+except ImportError:
+    _pyfftw_builders = None
+
+# pyFFTW plans by length, per thread: a plan owns its input and output
+# arrays, so sharing one between threads would race.
+_fft_plans = threading.local()
+
+# Below this many samples, thread start-up costs more than pocketfft saves.
+_FFT_THREADING_MIN_LENGTH = 16384
+
+# Zeros are returned as float64 (~17 significant digits), so computing them
+# with more than this many decimal digits only costs time.
+_MIN_WORKING_DPS = 20
+_MAX_WORKING_DPS = 25
+
+# Per-seed repulsed frequency vectors kept per instance.
+_MAX_SEED_CACHE = 32
+
+# Per-length entries kept per instance (sample grid, scaled frequencies) and
+# per thread (pyFFTW plans).
+_MAX_LENGTH_CACHE = 4
 
 # Cache for zeta zeros to avoid re-computation
 _zeta_zero_cache = {}
@@ -14,6 +54,115 @@ _known_zeros = np.array([
     48.005150881167160
 ])
 
+def _compute_zeta_zeros(N, precision):
+    """
+    Computes the imaginary parts of the first N zeta zeros, using python-flint
+    when it is installed and mpmath otherwise.
+    """
+    if _flint_acb is not None:
+        saved_dps = _flint_ctx.dps
+        _flint_ctx.dps = precision
+        try:
+            zeros_complex = _flint_acb.zeta_zeros(1, N)
+        finally:
+            _flint_ctx.dps = saved_dps
+    else:
+        with mpmath.workdps(precision):
+            zeros_complex = [mpmath.zetazero(k) for k in range(1, N + 1)]
+    return np.array([float(z.imag) for z in zeros_complex])
+
+def _cache_dir():
+    """
+    Returns the directory for the on-disk zero cache.
+
+    ZETANOISE_CACHE_DIR overrides the default of $XDG_CACHE_HOME/zetanoise
+    (or ~/.cache/zetanoise).
+    """
+    override = os.environ.get("ZETANOISE_CACHE_DIR")
+    if override:
+        return override
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "zetanoise")
+
+def _load_cached_zeros(N, precision):
+    """
+    Loads the first N zeros from the smallest on-disk file at this precision
+    holding at least N of them. Returns None on a miss.
+    """
+    pattern = os.path.join(glob.escape(_cache_dir()), f"zeros_N*_p{precision}.npy")
+    candidates = []
+    for path in glob.glob(pattern):
+        match = re.fullmatch(rf"zeros_N(\d+)_p{precision}\.npy", os.path.basename(path))
+        if match and int(match.group(1)) >= N:
+            candidates.append((int(match.group(1)), path))
+
+    for _, path in sorted(candidates):
+        try:
+            return np.load(path)[:N]
+        except (OSError, ValueError):
+            continue  # Unreadable or truncated file; try the next one.
+    return None
+
+def _save_cached_zeros(zeros_imag, precision):
+    """
+    Writes zeros to the on-disk cache. Failures are ignored: the cache only
+    saves time and must never break generation.
+    """
+    directory = _cache_dir()
+    path = os.path.join(directory, f"zeros_N{len(zeros_imag)}_p{precision}.npy")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.save(f, zeros_imag)
+        # Atomic rename, so concurrent readers never see a partial file.
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def _get_fft_plan(n):
+    """
+    Returns the calling thread's cached pyFFTW real-input FFT plan for length n.
+
+    Calling the plan copies the input into its own aligned array, so the
+    caller's signal is never modified. The returned output array is reused
+    by the next call with the same n on the same thread.
+    """
+    plans = getattr(_fft_plans, "by_length", None)
+    if plans is None:
+        plans = _fft_plans.by_length = {}
+    plan = plans.get(n)
+    if plan is None:
+        threads = os.cpu_count() if n >= _FFT_THREADING_MIN_LENGTH else 1
+        _evict_oldest(plans, _MAX_LENGTH_CACHE)
+        plan = plans[n] = _pyfftw_builders.rfft(np.empty(n), threads=threads)
+    return plan
+
+def _check_dtype(dtype):
+    """
+    Normalizes dtype and rejects anything but float32/float64.
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(f"dtype must be float32 or float64, got {dtype}")
+    return dtype
+
+def _evict_oldest(cache, max_size):
+    """
+    Makes room in a bounded cache by dropping its oldest entries when full.
+
+    Safe under concurrent callers: if another thread evicts the same key
+    first, or resizes the dict mid-read, this just tries again.
+    """
+    while len(cache) >= max_size:
+        try:
+            cache.pop(next(iter(cache), None), None)
+        except RuntimeError:
+            pass  # Dict changed size while reading its first key.
+
 class ZetaNoiseGenerator:
     """
     Generates noise modulated by the imaginary parts of the Riemann zeta zeros.
@@ -29,6 +178,9 @@ class ZetaNoiseGenerator:
         self.num_zeros = num_zeros
         self.gue_scale = gue_scale
         self.zeros = self._get_zeta_zeros(self.num_zeros, precision)
+        self._t_cache = {}
+        self._scaled_freqs_cache = {}
+        self._effective_freqs_cache = {}
 
     def _get_zeta_zeros(self, N, precision):
         """
@@ -37,46 +189,200 @@ class ZetaNoiseGenerator:
         if N <= 10 and N > 0:
             return _known_zeros[:N]
 
+        precision = max(_MIN_WORKING_DPS, min(precision, _MAX_WORKING_DPS))
         cache_key = (N, precision)
         if cache_key in _zeta_zero_cache:
             return _zeta_zero_cache[cache_key]
-        
-        print(f"Calculating first {N} zeta zeros with precision {precision} (this may take a moment)...")
-        zeros_complex = [mpmath.zetazero(k) for k in range(1, N + 1)]
-        zeros_imag = np.array([float(z.imag) for z in zeros_complex])
+
+        # The first N zeros are a prefix of any longer list at the same precision.
+        for (M, cached_precision), cached in _zeta_zero_cache.items():
+            if cached_precision == precision and M > N:
+                return cached[:N]
+
+        zeros_imag = _load_cached_zeros(N, precision)
+        if zeros_imag is None:
+            print(f"Calculating first {N} zeta zeros with precision {precision} (this may take a moment)...")
+            if _flint_acb is None and mpmath.libmp.BACKEND != 'gmpy':
+                # Raised here, one frame below __init__, so it points at the caller.
+                warnings.warn(
+                    "mpmath is using its pure-Python backend; install gmpy2 (or "
+                    "python-flint) to compute zeta zeros several times faster.",
+                    stacklevel=3,
+                )
+            zeros_imag = _compute_zeta_zeros(N, precision)
+            _save_cached_zeros(zeros_imag, precision)
         _zeta_zero_cache[cache_key] = zeros_imag
         return zeros_imag
 
-    def generate(self, length=1024, amplitude=0.1, seed=None):
+    def generate(self, length=1024, amplitude=0.1, seed=None, out=None, device='cpu',
+                 dtype=np.float64):
         """
         Generates a zeta-modulated noise signal using vectorized operations.
+
+        If `out` is given it must be an array of shape (length,) and the given
+        dtype; the signal is written into it and it is returned, so repeated
+        calls can reuse one buffer.
+
+        dtype may be np.float64 (default) or np.float32. float32 halves memory
+        traffic and doubles SIMD width, at noise-grade precision.
+
+        With device='cuda' the signal is computed on the GPU with CuPy and
+        copied back to a NumPy array. CuPy's random streams differ from
+        NumPy's, so a seed gives different (but reproducible) noise there.
         """
+        if device not in ('cpu', 'cuda'):
+            raise ValueError(f"device must be 'cpu' or 'cuda', got {device!r}")
+        dtype = _check_dtype(dtype)
+        if out is None:
+            out = np.empty(length, dtype=dtype)
+        elif out.shape != (length,) or out.dtype != dtype:
+            raise ValueError(f"out must be a {dtype} array of shape ({length},)")
+
+        if device == 'cuda':
+            out[...] = self._generate_cuda(length, amplitude, seed, dtype)
+            return out
+
         # This object now controls ALL randomness inside this function.
         rng = np.random.default_rng(seed)
         
-        base_noise = rng.standard_normal(length)
-        t = np.arange(length)
+        # Draw the base noise straight into out; the modulation is added in place.
+        rng.standard_normal(dtype=dtype, out=out)
         
-        zeta_freqs = self.zeros[:, np.newaxis]
+        cycle_step = self._effective_freqs(rng, seed, length, dtype)
+        self._add_modulation(cycle_step, amplitude, out)
+        return out
+
+    def _effective_freqs(self, rng, seed, length, dtype):
+        """
+        Returns the per-sample phase step in cycles, with GUE repulsion applied.
+
+        For integer seeds the repulsed frequencies are cached. The exponential
+        draw comes last in generate(), so on a hit it can be skipped without
+        changing the output. The key includes length and dtype because they
+        decide how much of the stream the base noise consumed first.
+        """
+        cycle_step = self._get_scaled_freqs(length)
+        if self.gue_scale <= 0:
+            return cycle_step
+
+        key = None
+        if isinstance(seed, numbers.Integral):
+            key = (seed, length, dtype, self.gue_scale)
+            cached = self._effective_freqs_cache.get(key)
+            if cached is not None:
+                return cached
+
+        # THIS IS THE CRITICAL FIX: Ensures determinism via the seeded rng object.
+        # Scale a copy: an in-place multiply would corrupt the cached frequencies.
+        repulsion_factors = 1 + self.gue_scale * rng.exponential(1, size=self.num_zeros)
+        cycle_step = cycle_step * repulsion_factors
+        if key is not None:
+            _evict_oldest(self._effective_freqs_cache, _MAX_SEED_CACHE)
+            self._effective_freqs_cache[key] = cycle_step
+        return cycle_step
+
+    def _generate_cuda(self, length, amplitude, seed, dtype):
+        """
+        GPU version of generate(); returns the signal as a NumPy array.
+        """
+        try:
+            import cupy as cp
+        except ImportError as exc:
+            raise ImportError("device='cuda' requires CuPy (pip install cupy)") from exc
+
+        rng = cp.random.default_rng(seed)
+        base_noise = rng.standard_normal(length, dtype=dtype)
+
+        cycle_step = cp.asarray(self._get_scaled_freqs(length))
         if self.gue_scale > 0:
-            # THIS IS THE CRITICAL FIX: Ensures determinism via the seeded rng object.
-            repulsion_factors = 1 + self.gue_scale * rng.exponential(1, size=(self.num_zeros, 1))
-            zeta_freqs *= repulsion_factors
-        
-        sines = np.sin(2 * np.pi * zeta_freqs * t / length)
-        
-        modulation = amplitude * np.sum(sines, axis=0)
-        
-        return base_noise + modulation
+            cycle_step = cycle_step * (1 + self.gue_scale * rng.exponential(1, size=self.num_zeros))
+        cycle_step = cycle_step.astype(dtype)
+
+        t = cp.arange(length, dtype=dtype)
+        sines = cp.sin((2 * np.pi * cycle_step)[:, cp.newaxis] * t)
+        signal = base_noise + amplitude * sines.sum(axis=0)
+        return cp.asnumpy(signal)
+
+    def generate_batch(self, batch, length=1024, amplitude=0.1, seed=None, dtype=np.float64):
+        """
+        Generates `batch` independent realizations as a (batch, length) array.
+
+        All base noise comes from a single draw, and with gue_scale == 0 the
+        modulation is computed once and shared by every row. The random
+        stream differs from `batch` separate calls to generate().
+        """
+        dtype = _check_dtype(dtype)
+        rng = np.random.default_rng(seed)
+
+        out = rng.standard_normal((batch, length), dtype=dtype)
+
+        cycle_step = self._get_scaled_freqs(length)
+        if self.gue_scale > 0:
+            repulsion_factors = 1 + self.gue_scale * rng.exponential(1, size=(batch, self.num_zeros))
+            for row, factors in zip(out, repulsion_factors):
+                self._add_modulation(cycle_step * factors, amplitude, row)
+        else:
+            modulation = np.zeros(length, dtype=dtype)
+            self._add_modulation(cycle_step, amplitude, modulation)
+            out += modulation
+        return out
+
+    def _add_modulation(self, cycle_step, amplitude, out):
+        """
+        Adds amplitude * sum_k sin(2*pi*cycle_step[k]*t) to out in place.
+        """
+        if _kernels.kernels_available():
+            # Fused kernel: never builds the (num_zeros, length) sine matrix.
+            _kernels.accumulate_sines(cycle_step, amplitude, out)
+        else:
+            length = out.shape[0]
+            # Allocated per call: a shared buffer would race between threads
+            # (ufuncs release the GIL) and pin num_zeros*length floats.
+            buf = np.empty((len(cycle_step), length), dtype=out.dtype)
+            # Scale the small per-zero vector by 2*pi rather than the whole matrix.
+            omega_step = (2 * np.pi * cycle_step).astype(out.dtype, copy=False)
+            np.multiply(omega_step[:, np.newaxis], self._get_t(length, out.dtype), out=buf)
+            np.sin(buf, out=buf)
+            modulation = buf.sum(axis=0)
+            modulation *= amplitude
+            out += modulation
+
+    def _get_t(self, length, dtype):
+        """
+        Returns the cached sample index grid np.arange(length) as dtype.
+        """
+        key = (length, dtype)
+        t = self._t_cache.get(key)
+        if t is None:
+            _evict_oldest(self._t_cache, _MAX_LENGTH_CACHE)
+            t = self._t_cache[key] = np.arange(length, dtype=dtype)
+        return t
+
+    def _get_scaled_freqs(self, length):
+        """
+        Returns the cached per-sample phase step zeros/length, in cycles.
+        """
+        scaled = self._scaled_freqs_cache.get(length)
+        if scaled is None:
+            _evict_oldest(self._scaled_freqs_cache, _MAX_LENGTH_CACHE)
+            scaled = self._scaled_freqs_cache[length] = self.zeros / length
+        return scaled
 
     def spectrum(self, noise_signal):
         """
         Computes the power spectrum of a given signal.
         """
-        n = len(noise_signal)
-        freqs = fftfreq(n, d=1.0)[:n // 2]
-        spectrum_complex = fft(noise_signal)[:n // 2]
-        power_spectrum = np.abs(spectrum_complex)**2
+        x = np.asarray(noise_signal, dtype=float)
+        n = len(x)
+        freqs = rfftfreq(n, d=1.0)[:n // 2]
+        # The input is real, so rfft computes only the non-redundant half.
+        if _pyfftw_builders is not None:
+            spectrum_complex = _get_fft_plan(n)(x)[:n // 2]
+        else:
+            workers = -1 if n >= _FFT_THREADING_MIN_LENGTH else 1
+            # The input may only be overwritten if asarray made a private copy.
+            spectrum_complex = rfft(x, workers=workers, overwrite_x=x is not noise_signal)[:n // 2]
+        power_spectrum = spectrum_complex.real**2 + spectrum_complex.imag**2
         return freqs, power_spectrum
 
     def stats(self, noise_signal, num_peaks=20):
@@ -88,13 +394,25 @@ class ZetaNoiseGenerator:
         if len(spec) < num_peaks:
             num_peaks = len(spec)
             
-        peak_indices = np.argsort(spec)[-num_peaks:]
-        peak_freqs = np.sort(freqs[peak_indices])
-        spacings = np.diff(peak_freqs)
+        # Only the top num_peaks are needed, so partition instead of sorting.
+        peak_indices = np.argpartition(spec, -num_peaks)[-num_peaks:]
+        # freqs is ascending, so sorting the indices sorts the frequencies.
+        peak_indices.sort()
+        peak_freqs = freqs[peak_indices]
+        # The mean of consecutive differences telescopes to (last - first) / (n - 1).
+        if len(peak_freqs) > 1:
+            avg_peak_spacing = (peak_freqs[-1] - peak_freqs[0]) / (len(peak_freqs) - 1)
+        else:
+            avg_peak_spacing = 0
+        
+        if _kernels.kernels_available():
+            mean, std = _kernels.mean_std(np.asarray(noise_signal, dtype=float))
+        else:
+            mean, std = np.mean(noise_signal), np.std(noise_signal)
         
         return {
-            'mean': np.mean(noise_signal),
-            'std': np.std(noise_signal),
+            'mean': mean,
+            'std': std,
             'spectrum_mean_power': np.mean(spec),
-            'avg_peak_spacing': np.mean(spacings) if len(spacings) > 0 else 0
+            'avg_peak_spacing': avg_peak_spacing
         }